@@ -4,19 +4,19 @@
 import sys
 import os
 import traceback
-import subprocess
 import tkinter as tk
 import tkinter.filedialog
 import tkinter.scrolledtext
 from tkinter import filedialog, messagebox, ttk
 from tkinter import font as tkfont
 import random
+import functools
+from operator import itemgetter
 import csv
 import socket
 import sqlite3
 import yaml
 from pathlib import Path
-from export_prompts_to_csv import MJImage
 
 # 定数の定義
 WINDOW_TITLE = "画像プロンプトランダム生成ツール"
@@ -44,26 +44,45 @@ FREE_TEXTS = [
     "a Japanese ink painting. Zen painting",
     "a Medieval European painting."
     ]
-S_OPTIONS = ["", "0", "10", "20", "30", "40", "50", "100", "150", "200", "250", "300", "400", "500", "600", "700", "800", "900", "1000"]
-AR_OPTIONS = ["", "16:9", "9:16", "4:3", "3:4"]  # 'ar'オプションの項目
-CHAOS_OPTIONS = ["", "0", "10", "20", "30", "40", "50", "60", "70", "80", "90", "100"]  # 'chaos'オプションの項目
-Q_OPTIONS = ["", "1", "2"]
-WEIRD_OPTIONS = ["", "0", "10", "20", "30", "40", "50", "100", "150", "200", "250", "500", "750", "1000", "1250", "1500", "1750", "2000", "2250", "2500", "2750", "3000"]  # 'weird'オプションの項目
+S_OPTIONS = ("", "0", "10", "20", "30", "40", "50", "100", "150", "200", "250", "300", "400", "500", "600", "700", "800", "900", "1000")
+AR_OPTIONS = ("", "16:9", "9:16", "4:3", "3:4")  # 'ar'オプションの項目
+CHAOS_OPTIONS = ("", "0", "10", "20", "30", "40", "50", "60", "70", "80", "90", "100")  # 'chaos'オプションの項目
+Q_OPTIONS = ("", "1", "2")
+WEIRD_OPTIONS = ("", "0", "10", "20", "30", "40", "50", "100", "150", "200", "250", "500", "750", "1000", "1250", "1500", "1750", "2000", "2250", "2500", "2750", "3000")  # 'weird'オプションの項目
 
 LABEL_EXCLUSION_WORDS = "除外語句："
 # DEFAULT_EXCLUSION_WORDS = ["", "sculpture", "ring", "rain", "sphere", "stature", "sphere, rain, people, sculpture"]
 
-# 定数としてホスト名を取得
-HOSTNAME = socket.gethostname()
+MESSAGE_EXPORT_MODULE_MISSING = (
+    "CSV出力モジュール(export_prompts_to_csv.py)を読み込めませんでした。\n"
+    "本スクリプトと同じフォルダに export_prompts_to_csv.py があるか確認してください。"
+)
+
+# 生成した各行の末尾から取り除き、ピリオド1つに置き換える文字
+SENTENCE_TERMINATORS = ",、;:；：!?\n.　 "
+
+# CSV投入時の「"本文","属性ID"」の区切り（先頭から順に試し、ちょうど2項目に分かれたものを採用する）
+CSV_FIELD_SEPARATORS = ('","', '", "')
+
+# ホスト名は位置情報の保存・復元時に初めて取得する（DNS設定によっては取得に時間がかかるため）
+@functools.lru_cache(maxsize=None)
+def get_hostname():
+    return socket.gethostname()
+
+# libyaml が使える環境では C 実装のローダーを使う
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
 
 # YAMLファイルを読み込むための関数
 def load_yaml_settings(file_path):
     """
     指定されたパスのYAMLファイルを読み込んで、設定を辞書として返す。
     """
-    with open(file_path, 'r', encoding="utf-8") as file:
-        # yamlモジュールを使用して設定ファイルを読み込む
-        settings = yaml.safe_load(file)
+    with open(file_path, 'rb') as file:
+        # yamlモジュールを使用して設定ファイルを読み込む（デコードはローダーに任せる）
+        settings = yaml.load(file, Loader=YamlLoader)
     return settings
 
 def save_position(root):
@@ -71,7 +90,7 @@ def save_position(root):
     ウィンドウの位置とサイズをCSVファイルに保存する。
     """
     print("ウィンドウ位置を保存中...")
-    position_data = [HOSTNAME, root.geometry()]
+    position_data = [get_hostname(), root.geometry()]
     print(f"保存データ: {position_data}")
     with open(POSITION_FILE, 'w', newline='', encoding="utf_8_sig") as csvfile:
         writer = csv.writer(csvfile)
@@ -87,7 +106,7 @@ def restore_position(root):
         with open(POSITION_FILE, newline='', encoding="utf_8_sig") as csvfile:
             reader = csv.reader(csvfile)
             for row in reader:
-                if row[0] == HOSTNAME:
+                if row[0] == get_hostname():
                     print(f"復元データ: {row[1]}")
                     root.geometry(row[1])
                     break
@@ -97,6 +116,7 @@ def restore_position(root):
 # アプリケーションの終了時の処理をカスタマイズする
 def on_close():
     save_position(root)  # ウィンドウの位置を保存
+    close_db_connection()  # DB接続を閉じる
     root.destroy()  # ウィンドウを破壊する
 
 def get_exception_trace():
@@ -105,6 +125,47 @@ def get_exception_trace():
     trace = traceback.format_exception(t, v, tb)
     return trace
 
+def sample_rows_by_key(rows, sample_sizes):
+    '''
+    (キー, 値...) 形式の行を1行ずつ読みながら、キーごとに最大 sample_sizes[キー] 件を無作為に抽出する。
+    リザーバサンプリングなので、結果セット全体をリストに溜め込まない。
+    '''
+    reservoirs = {key: [] for key in sample_sizes}
+    seen_counts = dict.fromkeys(sample_sizes, 0)
+    for row in rows:
+        key = row[0]
+        size = sample_sizes[key]
+        seen = seen_counts[key]
+        if seen < size:
+            reservoirs[key].append(row[1:])
+        else:
+            slot = random.randrange(seen + 1)
+            if slot < size:
+                reservoirs[key][slot] = row[1:]
+        seen_counts[key] = seen + 1
+    return reservoirs
+
+_db_connection = None
+
+def get_db_connection():
+    '''
+    アプリ全体で使い回すSQLite接続を返す。初回呼び出し時のみ接続してキャッシュを設定する。
+    '''
+    global _db_connection
+    if _db_connection is None:
+        _db_connection = sqlite3.connect(DEFAULT_DB_PATH)
+        _db_connection.execute("PRAGMA mmap_size=268435456")  # 256MB
+        _db_connection.execute("PRAGMA cache_size=-65536")  # 64MB
+        _db_connection.execute("PRAGMA temp_store=MEMORY")
+    return _db_connection
+
+def close_db_connection():
+    '''共有しているSQLite接続を閉じる'''
+    global _db_connection
+    if _db_connection is not None:
+        _db_connection.close()
+        _db_connection = None
+
 class CSVImportWindow:
     def __init__(self, master, update_callback):
         self.window = tk.Toplevel(master)
@@ -142,48 +203,59 @@ class CSVImportWindow:
             messagebox.showerror("エラー", f"CSVの処理中にエラーが発生しました: {get_exception_trace()}")
 
     def process_csv(self, csv_content):
-        conn = sqlite3.connect(DEFAULT_DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS prompts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            content TEXT
-        )
-        ''')
-
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS prompt_attribute_details (
-            prompt_id INTEGER,
-            attribute_detail_id INTEGER,
-            FOREIGN KEY (prompt_id) REFERENCES prompts (id),
-            FOREIGN KEY (attribute_detail_id) REFERENCES attribute_details (id)
-        )
-        ''')
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
 
-        for line in csv_content.splitlines():
-            try:
-                if "citation[oaicite" in line or '```' in line: continue # ``` &#8203;:citation[oaicite:0]{index=0}&#8203;
-                if line.strip() and len(line) > 10 and [line[0], line[-1]] == ['"', '"']:  # 空行をスキップ
-                    # 最初と最後の引用符を削除し、中央のカンマで分割                
-                    line = line.replace('"""', '"')
-                    try:
-                        content, attribute_detail_ids = line.strip('"').split('","')
-                    except:
-                        content, attribute_detail_ids = line.strip('"').split('", "')
-
-                    cursor.execute('INSERT INTO prompts (content) VALUES (?)', (content,))
-                    prompt_id = cursor.lastrowid
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS prompts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                content TEXT
+            )
+            ''')
+
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS prompt_attribute_details (
+                prompt_id INTEGER,
+                attribute_detail_id INTEGER,
+                FOREIGN KEY (prompt_id) REFERENCES prompts (id),
+                FOREIGN KEY (attribute_detail_id) REFERENCES attribute_details (id)
+            )
+            ''')
+
+            # generate_text の属性絞り込み（ad.value → pad.attribute_detail_id）で使うインデックス
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_pad_detail ON prompt_attribute_details (attribute_detail_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_ad_value ON attribute_details (value)')
+
+            attribute_links = []  # (prompt_id, attribute_detail_id) をまとめて投入する
+            for line in csv_content.splitlines():
+                try:
+                    if "citation[oaicite" in line or '```' in line: continue # ``` &#8203;:citation[oaicite:0]{index=0}&#8203;
+                    if line.strip() and len(line) > 10 and [line[0], line[-1]] == ['"', '"']:  # 空行をスキップ
+                        # 最初と最後の引用符を削除し、中央のカンマで本文と属性IDに分割
+                        line = line.replace('"""', '"')
+                        body = line.strip('"')
+                        for separator in CSV_FIELD_SEPARATORS:
+                            fields = body.split(separator)
+                            if len(fields) == 2:
+                                break
+                        else:
+                            raise ValueError("本文と属性IDの2項目に分割できません")
+                        content, attribute_detail_ids = fields
+
+                        cursor.execute('INSERT INTO prompts (content) VALUES (?)', (content,))
+                        prompt_id = cursor.lastrowid
                     
-                    for attribute_detail_id in attribute_detail_ids.split(','):
-                        cursor.execute('INSERT INTO prompt_attribute_details (prompt_id, attribute_detail_id) VALUES (?, ?)',
-                                    (prompt_id, int(attribute_detail_id)))
-            except:
-                messagebox.showerror("エラー", f"CSVの処理中にエラーが発生しました: line: [{line}], {get_exception_trace()}")
-                raise Exception("投入プロセス強制終了")
+                        attribute_links.extend((prompt_id, int(attribute_detail_id)) for attribute_detail_id in attribute_detail_ids.split(','))
+                except:
+                    messagebox.showerror("エラー", f"CSVの処理中にエラーが発生しました: line: [{line}], {get_exception_trace()}")
+                    raise Exception("投入プロセス強制終了")
 
-        conn.commit()
-        conn.close()
+            cursor.executemany('INSERT INTO prompt_attribute_details (prompt_id, attribute_detail_id) VALUES (?, ?)', attribute_links)
+            conn.commit()
+        except:
+            conn.rollback()  # 共有接続に途中まで投入した行を残さない
+            raise
 
 class TextGeneratorApp:
     def __init__(self, master):
@@ -192,6 +264,7 @@ class TextGeneratorApp:
         self.attribute_type_frames = {}
         self.attribute_detail_combos = {}
         self.attribute_count_combos = {}
+        self.attribute_detail_ids = {}  # プルダウンの並び順に対応する attribute_details.id
         self.load_attribute_data()
 
         # デフォルトフォントの設定
@@ -215,7 +288,7 @@ class TextGeneratorApp:
         self.button_csv_import.pack(pady=5, fill='x')
 
         # CSV出力ボタン
-        self.button_csv_output = tk.Button(self.main_frame, text="(DB確認用CSV出力)", command=MJImage().run)
+        self.button_csv_output = tk.Button(self.main_frame, text="(DB確認用CSV出力)", command=self.export_db_csv)
         self.button_csv_output.pack(pady=5, fill='x',)
 
         # 行数入力UI
@@ -364,9 +437,10 @@ class TextGeneratorApp:
         self.main_prompt = ""
         self.option_prompt = ""
         self.tail_free_texts = ""
+        self.mj_image = None  # CSV出力用（export_db_csv で初回のみ生成）
 
     def load_attribute_data(self):
-        conn = sqlite3.connect(DEFAULT_DB_PATH)
+        conn = get_db_connection()
         cursor = conn.cursor()
 
         # attribute_types の取得
@@ -384,13 +458,30 @@ class TextGeneratorApp:
             {'id': row[0], 'attribute_type_id': row[1], 'description': row[2], 'value': row[3], 'content_count': row[4]}
             for row in cursor.fetchall()
         ]
+        self.attribute_details_by_id = {detail['id']: detail for detail in self.attribute_details}
 
-        conn.close()
+        # 属性タイプごとの選択肢（content数が1以上のもの）を事前に振り分けておく
+        self.attribute_details_by_type = {}
+        for detail in self.attribute_details:
+            if detail['content_count'] > 0:
+                self.attribute_details_by_type.setdefault(detail['attribute_type_id'], []).append(detail)
 
     def open_csv_import_window(self):
         CSVImportWindow(self.master, self.update_attribute_details)
 
+    def export_db_csv(self):
+        # CSV出力モジュールは起動時ではなく、初めてボタンが押されたときに読み込み、以降は使い回す
+        if self.mj_image is None:
+            try:
+                from export_prompts_to_csv import MJImage
+            except ImportError:
+                messagebox.showerror("エラー", f"{MESSAGE_EXPORT_MODULE_MISSING}\n\n{get_exception_trace()}")
+                return
+            self.mj_image = MJImage()
+        self.mj_image.run()
+
     def open_exclusion_csv(self):
+        import subprocess  # 除外語句CSVを開くときにしか使わないため、起動時には読み込まない
         try:
             if os.name == 'nt':  # Windows
                 subprocess.Popen(['notepad.exe', EXCLUSION_CSV])
@@ -406,12 +497,10 @@ class TextGeneratorApp:
         self.load_attribute_data()
         for attribute_type in self.attribute_types:
             detail_combo = self.attribute_detail_combos[attribute_type['id']]
-            detail_values = ['-'] + [
-                f"{detail['description']} ({detail['content_count']})"
-                for detail in self.attribute_details
-                if detail['attribute_type_id'] == attribute_type['id'] and detail['content_count'] > 0
-            ]
+            details = self.attribute_details_by_type.get(attribute_type['id'], [])
+            detail_values = ['-'] + [f"{detail['description']} ({detail['content_count']})" for detail in details]
             detail_combo['values'] = detail_values
+            self.attribute_detail_ids[attribute_type['id']] = [None] + [detail['id'] for detail in details]
             detail_combo.set('-')
 
     def select_file(self):
@@ -430,11 +519,8 @@ class TextGeneratorApp:
             label = tk.Label(frame, text=attribute_type['description'], width=15, anchor='w')
             label.pack(side='left')
             
-            detail_values = ['-'] + [
-                f"{detail['description']} ({detail['content_count']})"
-                for detail in self.attribute_details
-                if detail['attribute_type_id'] == attribute_type['id'] and detail['content_count'] > 0
-            ]
+            details = self.attribute_details_by_type.get(attribute_type['id'], [])
+            detail_values = ['-'] + [f"{detail['description']} ({detail['content_count']})" for detail in details]
             detail_combo = ttk.Combobox(frame, values=detail_values, width=67, style="TCombobox", font=12, state="readonly")
             detail_combo.pack(side='left')
             detail_combo.set('-')
@@ -447,6 +533,7 @@ class TextGeneratorApp:
             self.attribute_type_frames[attribute_type['id']] = frame
             self.attribute_detail_combos[attribute_type['id']] = detail_combo
             self.attribute_count_combos[attribute_type['id']] = count_combo
+            self.attribute_detail_ids[attribute_type['id']] = [None] + [detail['id'] for detail in details]
 
             # プルダウンメニューのフォントを設定
             detail_combo.option_add('*TCombobox*Listbox.font', self.combo_font)
@@ -454,77 +541,79 @@ class TextGeneratorApp:
 
     def generate_text(self):
         try:
-            conn = sqlite3.connect(DEFAULT_DB_PATH)
+            conn = get_db_connection()
             cursor = conn.cursor()
             
             total_lines = int(self.entry_row_num.get())
             selected_lines = []
             
-            exclusion_words = [word.strip() for word in self.combo_exclusion_words.get().split(',') if word.strip()]
+            exclusion_words = parse_exclusion_words(self.combo_exclusion_words.get())
             if self.add_exclusion_words_var.get() and exclusion_words:
-                self.update_exclusion_words()  # 除外語句を更新
+                self.update_exclusion_words(exclusion_words)  # 除外語句を更新
+            # NOT LIKE は左から評価され、一致した時点で残りの条件を省けるため、一致しやすい短い語句から並べる
+            exclusion_words.sort(key=len)
+            # 選択された属性と件数を集めてから、まとめて1回のクエリで取得する
+            requested_details = []
             for attribute_type in self.attribute_types:
                 detail_combo = self.attribute_detail_combos[attribute_type['id']]
                 count_combo = self.attribute_count_combos[attribute_type['id']]
                 
-                detail = detail_combo.get()
+                detail_index = detail_combo.current()
                 count = count_combo.get()
                 
-                if detail != '-' and count != '-':
+                if detail_index > 0 and count != '-':
                     count = int(count)
                     if count > 0:
-                        detail_description = detail.split(' (')[0]  # Remove the content count
-                        detail_value = next((d['value'] for d in self.attribute_details if d['description'] == detail_description), None)
+                        # プルダウンの位置から id を引き、説明文での線形探索を避ける
+                        detail_id = self.attribute_detail_ids[attribute_type['id']][detail_index]
+                        detail_value = self.attribute_details_by_id[detail_id]['value']
                         if detail_value:
-                            if self.add_exclusion_words_var.get() and exclusion_words:
-                                exclusion_condition = ' AND ' + ' AND '.join(f"p.content NOT LIKE ?" for _ in exclusion_words)
-                                query = f'''
-                                    SELECT p.content 
-                                    FROM prompts p
-                                    JOIN prompt_attribute_details pad ON p.id = pad.prompt_id
-                                    JOIN attribute_details ad ON pad.attribute_detail_id = ad.id
-                                    WHERE ad.value = ? {exclusion_condition}
-                                '''
-                                params = [detail_value] + [f'%{word}%' for word in exclusion_words]
-                                cursor.execute(query, params)
-                            else:
-                                cursor.execute('''
-                                    SELECT p.content 
-                                    FROM prompts p
-                                    JOIN prompt_attribute_details pad ON p.id = pad.prompt_id
-                                    JOIN attribute_details ad ON pad.attribute_detail_id = ad.id
-                                    WHERE ad.value = ?
-                                ''', (detail_value,))
-                            matching_lines = cursor.fetchall()
-                            selected_lines.extend(random.sample(matching_lines, min(count, len(matching_lines))))
+                            requested_details.append((detail_value, count))
+
+            if requested_details:
+                sample_sizes = {}  # 同じ値が複数回選ばれた場合は件数を合算する
+                for detail_value, count in requested_details:
+                    sample_sizes[detail_value] = sample_sizes.get(detail_value, 0) + count
+                placeholders = ', '.join('?' for _ in sample_sizes)
+                params = list(sample_sizes)
+                exclusion_condition = ''
+                if self.add_exclusion_words_var.get() and exclusion_words:
+                    exclusion_condition = ' AND ' + ' AND '.join(f"p.content NOT LIKE ?" for _ in exclusion_words)
+                    params += [f'%{word}%' for word in exclusion_words]
+                query = f'''
+                    SELECT ad.value, p.id, p.content 
+                    FROM prompts p
+                    JOIN prompt_attribute_details pad ON p.id = pad.prompt_id
+                    JOIN attribute_details ad ON pad.attribute_detail_id = ad.id
+                    WHERE ad.value IN ({placeholders}) {exclusion_condition}
+                '''
+                cursor.execute(query, params)
+                for sampled_lines in sample_rows_by_key(cursor, sample_sizes).values():
+                    selected_lines.extend(sampled_lines)
             
             remaining_lines = total_lines - len(selected_lines)
             if remaining_lines > 0:
-                # cursor.execute('SELECT content FROM prompts')
+                # 除外語句・選択済みの行の除外とランダム抽出をSQLite側でまとめて行う
+                exclusion_condition = ''
+                params = []
                 if self.add_exclusion_words_var.get() and exclusion_words:
                     exclusion_condition = ' AND ' + ' AND '.join(f"content NOT LIKE ?" for _ in exclusion_words)
-                    query = f'SELECT content FROM prompts WHERE 1=1 {exclusion_condition}'
-                    cursor.execute(query, [f'%{word}%' for word in exclusion_words])
-                else:
-                    cursor.execute('SELECT content FROM prompts')
-                all_prompts = cursor.fetchall()
-                remaining_pool = [line for line in all_prompts if line not in selected_lines]
-                selected_lines.extend(random.sample(remaining_pool, remaining_lines))
-            
-            conn.close()
+                    params += [f'%{word}%' for word in exclusion_words]
+                # 同じ本文が別の id で登録されていても重複しないよう、本文で除外する
+                selected_contents = list({content for _, content in selected_lines})
+                if selected_contents:
+                    exclusion_condition += f" AND content NOT IN ({', '.join('?' for _ in selected_contents)})"
+                    params += selected_contents
+                query = f'SELECT id, content FROM prompts WHERE 1=1 {exclusion_condition} ORDER BY RANDOM() LIMIT ?'
+                cursor.execute(query, params + [remaining_lines])
+                selected_lines.extend(cursor.fetchall())
             
             random.shuffle(selected_lines)
             
-            processed_lines = []
-            for line in selected_lines:
-                line = line[0].strip()  # タプルから文字列を取り出し、余分な空白を削除
-                if line.endswith((",", "、", ";", ":", "；", "：", "!", "?", "\n")):
-                    line = line[:-1] + "."
-                elif not line.endswith("."):
-                    line += "."
-                processed_lines.append(line)
-            
-            self.main_prompt = ' '.join(processed_lines)
+            # (id, 本文) のタプルから本文を取り出し、余分な空白と末尾の句読点を除いてピリオドで終える
+            self.main_prompt = ' '.join(
+                line[1].strip().rstrip(SENTENCE_TERMINATORS) + "." for line in selected_lines
+            )
             self.update_option()
         except ValueError:
             messagebox.showerror("エラー", "行数は整数で入力してください。")
@@ -532,30 +621,40 @@ class TextGeneratorApp:
             messagebox.showerror("エラー", f"エラーが発生しました: {get_exception_trace()}")
 
     def make_option_prompt(self):
-        # オプションテキストの生成
-        tail_ar_text    = " --ar "    + self.combo_tail_ar.get() if self.combo_tail_ar.get() and self.add_tail_ar_text_var.get() else ''
-        tail_s_text    = " --s "    + self.combo_tail_s_text.get() if self.combo_tail_s_text.get() and self.add_tail_s_text_var.get() else ''
-        tail_chaos_text = " --chaos " + self.combo_tail_chaos.get() if self.combo_tail_chaos.get() and self.add_tail_chaos_text_var.get() else ''
-        tail_q_text = " --q " + self.combo_tail_q.get() if self.combo_tail_q.get() and self.add_tail_q_text_var.get() else ''
-        tail_weird_text = " --weird " + self.combo_tail_weird.get() if self.combo_tail_weird.get() and self.add_tail_weird_text_var.get() else ''
+        # オプションテキストの生成（各コンボボックスの値は1回だけ取得する）
+        option_sources = (
+            ("ar", self.combo_tail_ar, self.add_tail_ar_text_var),
+            ("s", self.combo_tail_s_text, self.add_tail_s_text_var),
+            ("chaos", self.combo_tail_chaos, self.add_tail_chaos_text_var),
+            ("q", self.combo_tail_q, self.add_tail_q_text_var),
+            ("weird", self.combo_tail_weird, self.add_tail_weird_text_var),
+        )
+        option_texts = []
+        for option_name, combo, enabled_var in option_sources:
+            value = combo.get()
+            if value and enabled_var.get():
+                option_texts.append(f" --{option_name} {value}")
         
         # オプションプロンプトの更新
-        self.option_prompt = tail_ar_text + tail_s_text + tail_chaos_text + tail_q_text + tail_weird_text
+        self.option_prompt = "".join(option_texts)
 
     def make_free_texts(self):
         # 末尾固定文の生成
         tail_free_text1    = " " + self.combo_tail_free_text1.get() if self.combo_tail_free_text1.get() and self.add_tail_free_text_var1.get() else ''
         self.tail_free_texts = tail_free_text1
 
+    def refresh_output(self):
+        # 連結して出力エリアに反映（内容が変わらない場合は書き換えない）
+        result = "".join((self.main_prompt, self.tail_free_texts, self.option_prompt))
+        if self.text_output.get('1.0', 'end-1c') != result:
+            self.text_output.delete('1.0', tk.END)
+            self.text_output.insert(tk.END, result)
+
     def update_option(self):
         try:
             # オプションのみ更新
             self.make_option_prompt()
-            
-            # 連結
-            result = self.main_prompt + self.tail_free_texts + self.option_prompt
-            self.text_output.delete('1.0', tk.END)
-            self.text_output.insert(tk.END, result)
+            self.refresh_output()
         except Exception:
             print(get_exception_trace())
 
@@ -563,11 +662,7 @@ class TextGeneratorApp:
         try:
             # 末尾固定文のみ更新
             self.make_free_texts()
-            
-            # 連結
-            result = self.main_prompt + self.tail_free_texts + self.option_prompt
-            self.text_output.delete('1.0', tk.END)
-            self.text_output.insert(tk.END, result)
+            self.refresh_output()
         except Exception:
             print(get_exception_trace())
 
@@ -576,11 +671,7 @@ class TextGeneratorApp:
             if self.autofix_var.get():
                 self.make_free_texts()
                 self.make_option_prompt()
-                
-                # 連結
-                result = self.main_prompt + self.tail_free_texts + self.option_prompt
-                self.text_output.delete('1.0', tk.END)
-                self.text_output.insert(tk.END, result)
+                self.refresh_output()
         except Exception:
             print(get_exception_trace())
 
@@ -597,9 +688,9 @@ class TextGeneratorApp:
         self.generate_text()
         self.copy_all_to_clipboard()
         
-    def update_exclusion_words(self):
-        new_words = [word.strip() for word in self.combo_exclusion_words.get().split(',') if word.strip()]
-        new_words.sort()
+    def update_exclusion_words(self, exclusion_words):
+        # generate_text で分割済みの語句を受け取り、コンボボックスの文字列を再度分割しない
+        new_words = sorted(exclusion_words)
         new_phrase = ", ".join(new_words)
         
         current_words = load_exclusion_words()
@@ -608,26 +699,49 @@ class TextGeneratorApp:
                 writer = csv.writer(file, quotechar='"', quoting=csv.QUOTE_ALL)
                 writer.writerow([new_phrase])
             
-            # プルダウンメニューを更新
-            updated_words = load_exclusion_words()
-            self.combo_exclusion_words['values'] = updated_words
+            # 追記した内容は分かっているので、CSVを読み直さずにキャッシュとプルダウンメニューを更新
+            current_words.append(new_phrase)
+            cache_exclusion_words(current_words)
+            self.combo_exclusion_words['values'] = current_words
+
+def parse_exclusion_words(text):
+    '''
+    カンマ区切りの除外語句を分割する。空の語句を除き、重複は最初の出現だけを残す。
+    '''
+    return list(dict.fromkeys(word for word in (word.strip() for word in text.split(',')) if word))
+
+_exclusion_words_cache = None  # (最終更新時刻, 除外語句リスト)
 
 def load_exclusion_words():
+    '''
+    除外語句CSVを読み込む。ファイルが前回から更新されていなければキャッシュを返す。
+    '''
+    global _exclusion_words_cache
     try:
+        mtime = os.stat(EXCLUSION_CSV).st_mtime_ns
+        if _exclusion_words_cache is not None and _exclusion_words_cache[0] == mtime:
+            return list(_exclusion_words_cache[1])
         with open(EXCLUSION_CSV, 'r', encoding='utf-8', newline='') as file:
             reader = csv.reader(file, quotechar='"', quoting=csv.QUOTE_ALL)
-            return [""] + [row[0] for row in reader if row]
+            words = [""] + [row[0] for row in reader if row]
     except FileNotFoundError:
         return [""]
+    _exclusion_words_cache = (mtime, words)
+    return list(words)
+
+def cache_exclusion_words(words):
+    '''
+    除外語句CSVへ追記した後のリストをキャッシュに反映し、次回の読み込みで再解析しないようにする。
+    '''
+    global _exclusion_words_cache
+    _exclusion_words_cache = (os.stat(EXCLUSION_CSV).st_mtime_ns, list(words))
 
 # YAML設定ファイルパス
 yaml_settings_path = 'desktop_gui_settings.yaml'
 settings = load_yaml_settings(yaml_settings_path)
-BASE_FOLDER = settings["app_image_prompt_creator"]["BASE_FOLDER"]
-DEFAULT_TXT_PATH = settings["app_image_prompt_creator"]["DEFAULT_TXT_PATH"]
-DEFAULT_DB_PATH = settings["app_image_prompt_creator"]["DEFAULT_DB_PATH"]
-POSITION_FILE = settings["app_image_prompt_creator"]["POSITION_FILE"]
-EXCLUSION_CSV = settings["app_image_prompt_creator"]["EXCLUSION_CSV"]
+(BASE_FOLDER, DEFAULT_TXT_PATH, DEFAULT_DB_PATH, POSITION_FILE, EXCLUSION_CSV) = itemgetter(
+    "BASE_FOLDER", "DEFAULT_TXT_PATH", "DEFAULT_DB_PATH", "POSITION_FILE", "EXCLUSION_CSV"
+)(settings["app_image_prompt_creator"])
 
 DEFAULT_EXCLUSION_WORDS = load_exclusion_words()
 